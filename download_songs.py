@@ -1,6 +1,13 @@
 #!/usr/bin/env python3
 import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from urllib.parse import parse_qs, urlparse
 
 from tqdm import tqdm
 from yt_dlp import YoutubeDL
@@ -14,26 +21,35 @@ def get_args():
         "--playlist",
         help="YouTube playlist URL. If omitted, uses download.playlist_url from vars.json",
     )
+    parser.add_argument(
+        "--refresh-playlist",
+        action="store_true",
+        help="Ignore the cached playlist metadata and re-fetch it from YouTube",
+    )
     return parser.parse_args()
 
 
-def get_playlist_entries(playlist_url: str) -> list[str]:
+def iter_playlist_entries(playlist_url: str):
     """
-    Use yt-dlp to extract video URLs from a playlist without downloading.
-    Normalizes entries so we always get a proper https://youtube.com/watch?v=... URL.
+    Use yt-dlp to extract video URLs from a playlist without downloading,
+    yielding them as playlist pages arrive so downloads can start before
+    metadata for the whole playlist has been fetched. Skipping yt-dlp's
+    processing step (process=False) is what keeps info["entries"] a real
+    generator; a processed extract_info materializes the full list first.
+    Normalizes entries so we always get a proper https://youtube.com/watch?v=... URL,
+    deduped by video ID.
     """
     ydl_opts = {
         "quiet": True,
         "skip_download": True,
-        "extract_flat": True,
+        "extract_flat": "in_playlist",
     }
 
-    urls: list[str] = []
+    seen_ids: set[str] = set()
     with YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(playlist_url, download=False)
-        entries = info.get("entries", []) or []
+        info = ydl.extract_info(playlist_url, download=False, process=False)
 
-        for entry in entries:
+        for entry in info.get("entries", []) or []:
             # Prefer full webpage URL if present
             url = entry.get("webpage_url") or entry.get("url")
             if not url:
@@ -43,32 +59,90 @@ def get_playlist_entries(playlist_url: str) -> list[str]:
             if not url.startswith("http"):
                 url = f"https://www.youtube.com/watch?v={url}"
 
-            urls.append(url)
+            vid = entry.get("id") or video_id(url) or url
+            if vid in seen_ids:
+                continue
+            seen_ids.add(vid)
+
+            yield url
+
+
+def video_id(url: str) -> str | None:
+    """Extract the v= query parameter from a watch URL, if present."""
+    ids = parse_qs(urlparse(url).query).get("v")
+    return ids[0] if ids else None
+
+
+def load_archive_ids(archive_path: Path) -> set[str]:
+    """
+    Read video IDs from a yt-dlp download archive file.
+    Lines look like 'youtube <video_id>'.
+    """
+    ids: set[str] = set()
+    try:
+        for line in archive_path.read_text(encoding="utf-8").splitlines():
+            parts = line.split()
+            if parts:
+                ids.add(parts[-1])
+    except OSError:
+        pass
+    return ids
 
-    # Optional: remove duplicates while preserving order
-    seen = set()
-    normalized = []
-    for u in urls:
-        if u in seen:
-            continue
-        seen.add(u)
-        normalized.append(u)
 
-    return normalized
+def playlist_cache_path(base_dir: Path, playlist_url: str) -> Path:
+    key = hashlib.sha1(playlist_url.encode("utf-8")).hexdigest()
+    return base_dir / ".playlist_cache" / f"{key}.json"
+
+
+def load_cached_entries(cache_path: Path, ttl_sec: float) -> list[str] | None:
+    """
+    Return the cached URL list if the cache file exists, is fresh, and
+    holds at least one URL, otherwise None. An empty list is treated as
+    a miss so a bad fetch never pins "no entries" for the whole TTL.
+    """
+    try:
+        age = time.time() - cache_path.stat().st_mtime
+        if age >= ttl_sec:
+            return None
+        data = json.loads(cache_path.read_text(encoding="utf-8"))
+        if not isinstance(data, dict):
+            return None
+        urls = data.get("urls")
+        if isinstance(urls, list) and urls:
+            return urls
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def save_cached_entries(cache_path: Path, urls: list[str]):
+    """
+    Persist the URL list atomically (write to .tmp, then rename into place).
+    """
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    payload = json.dumps({"urls": urls, "fetched_at": time.time()})
+    tmp_path = cache_path.with_suffix(".tmp")
+    tmp_path.write_text(payload, encoding="utf-8")
+    os.replace(tmp_path, cache_path)
 
 
 def write_songlist(base_dir: Path, urls: list[str]) -> Path:
     songlist_path = base_dir / "songlist"
-    with songlist_path.open("w", encoding="utf-8") as f:
-        for u in urls:
-            f.write(u + "\n")
+    songlist_path.write_text(
+        "\n".join(urls) + ("\n" if urls else ""),
+        encoding="utf-8",
+    )
     return songlist_path
 
 
-def download_audio(url: str, songs_dir: Path, audio_format: str):
+def build_ydl(songs_dir: Path, audio_format: str) -> YoutubeDL:
     """
-    Download audio from a single URL into songs_dir.
+    Build a YoutubeDL instance for downloading audio into songs_dir.
     Prefer the given format (e.g. 140), but fall back to best m4a / best.
+
+    Constructing a YoutubeDL parses all extractors and sets up networking,
+    so callers should build one instance per worker and reuse it rather
+    than constructing a fresh one per URL.
     """
     format_selector = f"{audio_format}/bestaudio[ext=m4a]/bestaudio/best"
 
@@ -77,10 +151,23 @@ def download_audio(url: str, songs_dir: Path, audio_format: str):
         "outtmpl": str(songs_dir / "%(title)s - %(uploader)s.%(ext)s"),
         "quiet": True,
         "noprogress": True,
+        # Fetch DASH fragments in parallel within each video
+        "concurrent_fragment_downloads": 4,
+        # Record finished downloads so incremental runs can skip them
+        "download_archive": str(songs_dir / ".archive.txt"),
     }
 
-    with YoutubeDL(ydl_opts) as ydl:
-        ydl.download([url])
+    return YoutubeDL(ydl_opts)
+
+
+def write_done_sentinel(songs_dir: Path):
+    """
+    Atomically drop the sentinel that tells watchers (generate_maps
+    --watch) that no more audio files will arrive.
+    """
+    tmp_path = songs_dir / ".download_done.tmp"
+    tmp_path.write_text(str(time.time()), encoding="utf-8")
+    os.replace(tmp_path, songs_dir / ".download_done")
 
 
 def main():
@@ -91,6 +178,9 @@ def main():
     songs_dir = base_dir / cfg["paths"]["songs"]
     songs_dir.mkdir(parents=True, exist_ok=True)
 
+    # Clear any sentinel left by a previous run before downloading
+    (songs_dir / ".download_done").unlink(missing_ok=True)
+
     audio_format = cfg["download"].get("audio_format", "140")
     cfg_playlist_url = cfg["download"].get("playlist_url") or ""
     playlist_url = args.playlist or cfg_playlist_url
@@ -100,27 +190,90 @@ def main():
 
     print(f"[INFO] Using playlist: {playlist_url}")
 
-    urls = get_playlist_entries(playlist_url)
-    if not urls:
-        raise SystemExit("[ERROR] No entries found in playlist.")
+    # Playlist metadata is the slowest step for large playlists, so cache
+    # the normalized URL list on disk and reuse it while fresh.
+    cache_ttl = float(cfg["download"].get("playlist_cache_ttl_sec", 3600))
+    cache_path = playlist_cache_path(base_dir, playlist_url)
+
+    cached_urls = None
+    if not args.refresh_playlist:
+        cached_urls = load_cached_entries(cache_path, cache_ttl)
+        if cached_urls is not None:
+            print(f"[INFO] Using cached playlist metadata from {cache_path}")
 
-    print(f"[INFO] Found {len(urls)} videos in playlist.")
-    songlist_path = write_songlist(base_dir, urls)
-    print(f"[INFO] Wrote songlist to: {songlist_path}")
+    # Filter out videos already in the download archive before dispatch,
+    # so incremental runs don't pay a network round-trip per known video.
+    existing_ids = load_archive_ids(songs_dir / ".archive.txt")
 
     use_progress = bool(cfg["download"].get("progress_bar", True))
-    iterable = tqdm(urls, desc="Downloading audio", unit="video") if use_progress else urls
-
-    for url in iterable:
-        try:
-            download_audio(url, songs_dir, audio_format)
-        except Exception as e:
-            msg = f"[ERROR] Failed to download {url}: {e}"
-            if use_progress:
-                tqdm.write(msg)
-            else:
-                print(msg)
+    concurrency = int(cfg["download"].get("concurrency", 4))
+
+    # One YoutubeDL per worker thread: instances are not safe to share
+    # across threads, but reusing one per worker avoids paying the
+    # extractor-init cost for every URL.
+    local = threading.local()
+
+    def download_one(url: str):
+        ydl = getattr(local, "ydl", None)
+        if ydl is None:
+            ydl = local.ydl = build_ydl(songs_dir, audio_format)
+        ydl.download([url])
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # On a cache miss, entries stream out of yt-dlp lazily, so the
+        # first downloads start while playlist metadata is still arriving.
+        source = cached_urls if cached_urls is not None else iter_playlist_entries(playlist_url)
+
+        urls: list[str] = []
+        skipped = 0
+        futures: dict = {}
+        for url in source:
+            urls.append(url)
+            if video_id(url) in existing_ids:
+                skipped += 1
+                continue
+            futures[executor.submit(download_one, url)] = url
+
+        # Never cache an empty fetch: the next run should retry YouTube
+        # instead of failing from cache until the TTL expires.
+        if cached_urls is None and urls:
+            save_cached_entries(cache_path, urls)
+
+        if not urls:
+            raise SystemExit("[ERROR] No entries found in playlist.")
+
+        print(f"[INFO] Found {len(urls)} videos in playlist.")
+        songlist_path = write_songlist(base_dir, urls)
+        print(f"[INFO] Wrote songlist to: {songlist_path}")
+        if skipped:
+            print(f"[INFO] Skipping {skipped} already-downloaded videos.")
+
+        if not futures:
+            write_done_sentinel(songs_dir)
+            print("[DONE] All videos already downloaded.")
+            return
+
+        completed = as_completed(futures)
+        if use_progress:
+            completed = tqdm(
+                completed,
+                total=len(futures),
+                desc="Downloading audio",
+                unit="video",
+            )
+
+        for future in completed:
+            url = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                msg = f"[ERROR] Failed to download {url}: {e}"
+                if use_progress:
+                    tqdm.write(msg)
+                else:
+                    print(msg)
 
+    write_done_sentinel(songs_dir)
     print("[DONE] Audio downloads complete.")
 
 
@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
+import argparse
+import asyncio
+import os
 from pathlib import Path
 
-from playwright.sync_api import sync_playwright, TimeoutError, Page
+from playwright.async_api import async_playwright, Page, TimeoutError
 from tqdm import tqdm
 
 from config import load_config
@@ -14,11 +17,21 @@ ADVANCED_TOGGLE_SELECTOR = "svg:has(path[d='M3 6L9 12L15 6'])"
 # MODEL_SELECT_SELECTOR is built dynamically from config
 
 
-def slide_to_generate(page: Page, slider_selector: str):
-    slider = page.locator(slider_selector).first
-    slider.wait_for(state="visible", timeout=10_000)
+def get_args():
+    parser = argparse.ArgumentParser(description="Generate Beat Saber maps via BeatSage.")
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep polling songs_dir for new audio files until the downloader's "
+             ".download_done sentinel appears (used by the concurrent pipeline)",
+    )
+    return parser.parse_args()
 
-    box = slider.bounding_box()
+
+async def slide_to_generate(page: Page, slider):
+    await slider.wait_for(state="visible", timeout=10_000)
+
+    box = await slider.bounding_box()
     if box is None:
         raise RuntimeError("Could not get bounding box for slider")
 
@@ -27,21 +40,111 @@ def slide_to_generate(page: Page, slider_selector: str):
     end_x = box["x"] + box["width"] * 0.8
     end_y = start_y
 
-    page.mouse.move(start_x, start_y)
-    page.mouse.down()
-    page.mouse.move(end_x, end_y, steps=30)
-    page.mouse.up()
+    await page.mouse.move(start_x, start_y)
+    await page.mouse.down()
+    await page.mouse.move(end_x, end_y, steps=30)
+    await page.mouse.up()
 
 
 def iter_audio_files(songs_dir: Path):
     exts = {".m4a", ".mp3", ".wav", ".ogg", ".flac", ".aac", ".aiff"}
-    for f in sorted(songs_dir.iterdir()):
-        if f.is_file() and f.suffix.lower() in exts:
-            yield f
-
-
-def main():
+    # scandir entries carry cached type info, so filtering by extension
+    # first and is_file(follow_symlinks=False) avoids a stat per file.
+    with os.scandir(songs_dir) as it:
+        entries = [
+            Path(entry.path)
+            for entry in it
+            if os.path.splitext(entry.name)[1].lower() in exts
+            and entry.is_file(follow_symlinks=False)
+        ]
+    entries.sort()
+    yield from entries
+
+
+async def process_audio(
+    page: Page,
+    audio: Path,
+    maps_dir: Path,
+    beatsage_url: str,
+    artist_name: str,
+    difficulty_label: str,
+    model_value: str,
+    model_select_selector: str,
+    download_timeout_ms: int,
+):
+    """
+    Generate and download one map on the given page: upload the audio,
+    fill in metadata, trigger generation, and save the resulting ZIP.
+    """
+    tqdm.write(f"[MAP] Generating map for {audio.name}")
+
+    # Locators are lazily resolved, so build them all up front; the steps
+    # below only pay selector parsing once per handle.
+    file_input = page.locator(FILE_INPUT_SELECTOR).first
+    artist_input = page.locator(ARTIST_INPUT_SELECTOR).first
+    difficulty_toggle = page.locator(
+        "span.control-label",
+        has_text=difficulty_label
+    ).first
+    advanced_toggle = page.locator(ADVANCED_TOGGLE_SELECTOR).first
+    model_select = page.locator(model_select_selector).first
+    slider = page.locator(SLIDER_SELECTOR).first
+
+    # 1. Open BeatSage. The context-level route already strips images,
+    # fonts and analytics, and every control below waits for its own
+    # locator, so there is no need to wait for network idle.
+    await page.goto(beatsage_url, wait_until="domcontentloaded")
+
+    # 2. Upload audio file once the input exists (the real readiness
+    # signal for the form; the input stays hidden, so wait for attached)
+    await file_input.wait_for(state="attached", timeout=15_000)
+    await file_input.set_input_files(str(audio))
+
+    # 3. Fill in artist name
+    try:
+        await artist_input.wait_for(state="visible", timeout=10_000)
+        await artist_input.fill(artist_name)
+    except Exception as e:
+        tqdm.write(f"[WARN] Could not fill artist for {audio.name}: {e}")
+
+    # 4. Enable desired difficulty
+    try:
+        await difficulty_toggle.wait_for(state="visible", timeout=10_000)
+        await difficulty_toggle.click()
+    except Exception as e:
+        tqdm.write(f"[WARN] Could not set difficulty {difficulty_label} for {audio.name}: {e}")
+
+    # 5. Expand advanced options and select model version
+    try:
+        await advanced_toggle.wait_for(state="visible", timeout=10_000)
+        await advanced_toggle.click()
+
+        await model_select.wait_for(state="visible", timeout=10_000)
+        await model_select.select_option(model_value)
+    except Exception as e:
+        tqdm.write(f"[WARN] Could not set model {model_value} for {audio.name}: {e}")
+
+    # 6. Slide to trigger generation and wait for download
+    try:
+        async with page.expect_download(timeout=download_timeout_ms) as dl_info:
+            await slide_to_generate(page, slider)
+
+        download = await dl_info.value
+        suggested = download.suggested_filename
+        target = maps_dir / suggested
+        await download.save_as(str(target))
+
+        tqdm.write(f"[OK] Saved map to {target}")
+
+    except TimeoutError:
+        tqdm.write(f"[TIMEOUT] No download for {audio.name} within timeout")
+    except Exception as e:
+        tqdm.write(f"[ERROR] Failed for {audio.name}: {e}")
+
+
+async def _main():
     cfg = load_config()
+    args = get_args()
 
     base_dir = Path(cfg["base_dir"])
     songs_dir = base_dir / cfg["paths"]["songs"]
@@ -56,86 +159,118 @@ def main():
     model_value = beatsage_cfg["model_value"]
     timeout_minutes = beatsage_cfg.get("download_timeout_minutes", 10)
     download_timeout_ms = timeout_minutes * 60 * 1000
+    max_parallel_pages = int(beatsage_cfg.get("max_parallel_pages", 3))
 
     model_select_selector = f"select:has(option[value='{model_value}'])"
 
-    audio_files = list(iter_audio_files(songs_dir))
-    if not audio_files:
-        print(f"[INFO] No audio files found in {songs_dir}")
-        return
+    # Written by download_songs.py when no more audio files will arrive
+    sentinel = songs_dir / ".download_done"
 
-    print(f"[INFO] Found {len(audio_files)} audio files in {songs_dir}")
+    seen: set[Path] = set()
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=headless)
-        context = browser.new_context(accept_downloads=True)
-        page = context.new_page()
-
-        for audio in tqdm(audio_files, desc="Generating maps", unit="map"):
+    def scan_pending() -> list[Path]:
+        """Return audio files not yet handled, skipping those with maps."""
+        # Read the zip names once per scan; globbing per audio file
+        # re-walks maps_dir N times
+        existing_zip_stems = [p.stem for p in maps_dir.glob("*.zip")]
+        pending = []
+        for audio in iter_audio_files(songs_dir):
+            if audio in seen:
+                continue
+            seen.add(audio)
             base = audio.stem
-            existing_zips = list(maps_dir.glob(f"*{base}*.zip"))
-            if existing_zips:
+            if any(base in stem for stem in existing_zip_stems):
                 tqdm.write(f"[SKIP] Map already exists for {base}")
                 continue
+            pending.append(audio)
+        return pending
+
+    pending = scan_pending()
+
+    if not args.watch:
+        if not seen:
+            print(f"[INFO] No audio files found in {songs_dir}")
+            return
+        print(f"[INFO] Found {len(seen)} audio files in {songs_dir}")
+        if not pending:
+            print("[INFO] All maps already generated.")
+            return
+
+    # Most of the per-map time is BeatSage's server-side work, so run a few
+    # pages concurrently on the same browser context.
+    semaphore = asyncio.Semaphore(max_parallel_pages)
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=headless)
+        context = await browser.new_context(accept_downloads=True)
+
+        # Only the app JS and XHRs are needed to drive the form; abort
+        # decorative and analytics requests to cut per-map page loads.
+        blocked_types = {"image", "font", "media", "stylesheet"}
+        blocked_hosts = ("google-analytics", "googletagmanager", "doubleclick")
+
+        async def block_static(route):
+            request = route.request
+            if request.resource_type in blocked_types or any(
+                host in request.url for host in blocked_hosts
+            ):
+                await route.abort()
+            else:
+                await route.continue_()
+
+        await context.route("**/*", block_static)
+
+        # In watch mode the total grows as new files arrive
+        initial_total = 0 if args.watch else len(pending)
+        progress = tqdm(total=initial_total, desc="Generating maps", unit="map")
+
+        async def bounded(audio: Path):
+            async with semaphore:
+                page = await context.new_page()
+                try:
+                    await process_audio(
+                        page,
+                        audio,
+                        maps_dir,
+                        beatsage_url,
+                        artist_name,
+                        difficulty_label,
+                        model_value,
+                        model_select_selector,
+                        download_timeout_ms,
+                    )
+                finally:
+                    await page.close()
+                    progress.update(1)
+
+        if not args.watch:
+            await asyncio.gather(*(bounded(audio) for audio in pending))
+        else:
+            print(f"[INFO] Watching {songs_dir} for new audio files...")
+            while True:
+                # Snapshot the sentinel, then rescan: the loop may only
+                # stop when a scan started after downloads finished turns
+                # up nothing, so a file that lands just before the
+                # sentinel does is still picked up.
+                downloads_done = sentinel.exists()
+                pending.extend(scan_pending())
+                if pending:
+                    progress.total = (progress.total or 0) + len(pending)
+                    progress.refresh()
+                    batch, pending = pending, []
+                    await asyncio.gather(*(bounded(audio) for audio in batch))
+                elif downloads_done:
+                    break
+                else:
+                    await asyncio.sleep(5)
+
+        progress.close()
+        await browser.close()
 
-            tqdm.write(f"[MAP] Generating map for {audio.name}")
-
-            # 1. Open BeatSage
-            page.goto(beatsage_url, wait_until="networkidle")
-
-            # 2. Upload audio file
-            page.set_input_files(FILE_INPUT_SELECTOR, str(audio))
-
-            # 3. Fill in artist name
-            try:
-                artist_input = page.locator(ARTIST_INPUT_SELECTOR).first
-                artist_input.wait_for(state="visible", timeout=10_000)
-                artist_input.fill(artist_name)
-            except Exception as e:
-                tqdm.write(f"[WARN] Could not fill artist for {audio.name}: {e}")
-
-            # 4. Enable desired difficulty
-            try:
-                expert_label = page.locator(
-                    "span.control-label",
-                    has_text=difficulty_label
-                ).first
-                expert_label.wait_for(state="visible", timeout=10_000)
-                expert_label.click()
-            except Exception as e:
-                tqdm.write(f"[WARN] Could not set difficulty {difficulty_label} for {audio.name}: {e}")
-
-            # 5. Expand advanced options and select model version
-            try:
-                advanced_toggle = page.locator(ADVANCED_TOGGLE_SELECTOR).first
-                advanced_toggle.wait_for(state="visible", timeout=10_000)
-                advanced_toggle.click()
-
-                model_select = page.locator(model_select_selector).first
-                model_select.wait_for(state="visible", timeout=10_000)
-                model_select.select_option(model_value)
-            except Exception as e:
-                tqdm.write(f"[WARN] Could not set model {model_value} for {audio.name}: {e}")
-
-            # 6. Slide to trigger generation and wait for download
-            try:
-                with page.expect_download(timeout=download_timeout_ms) as dl_info:
-                    slide_to_generate(page, SLIDER_SELECTOR)
-
-                download = dl_info.value
-                suggested = download.suggested_filename
-                target = maps_dir / suggested
-                download.save_as(str(target))
-
-                tqdm.write(f"[OK] Saved map to {target}")
-
-            except TimeoutError:
-                tqdm.write(f"[TIMEOUT] No download for {audio.name} within timeout")
-            except Exception as e:
-                tqdm.write(f"[ERROR] Failed for {audio.name}: {e}")
-
-        browser.close()
+
+def main():
+    asyncio.run(_main())
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,11 +1,117 @@
 #!/usr/bin/env python3
+import argparse
+import hashlib
 import json
+import os
+import shutil
 import zipfile
-import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 from config import load_config
 
+# orjson parses and serializes several times faster than stdlib json,
+# which matters for difficulty files holding thousands of notes. Fall
+# back to json so the script still runs without the dependency.
+try:
+    import orjson
+
+    def loads_dat(blob: bytes):
+        return orjson.loads(blob)
+
+    def dumps_dat(data) -> bytes:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+
+except ImportError:
+    def loads_dat(blob: bytes):
+        return json.loads(blob)
+
+    def dumps_dat(data) -> bytes:
+        return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+# Audio-extension tokens removed by clean_name (matched case-insensitively)
+_AUDIO_EXTS = (".m4a", ".mp3", ".wav", ".ogg", ".flac", ".aac")
+
+
+def _strip_audio_exts(name: str) -> str:
+    """Drop extension tokens like '.m4a' unless followed by a word character."""
+    out = []
+    lower = name.lower()
+    i = 0
+    n = len(name)
+    while i < n:
+        if name[i] == ".":
+            for ext in _AUDIO_EXTS:
+                end = i + len(ext)
+                if lower.startswith(ext, i):
+                    nxt = name[end] if end < n else ""
+                    if not (nxt.isalnum() or nxt == "_"):
+                        i = end
+                        break
+            else:
+                out.append(name[i])
+                i += 1
+            continue
+        out.append(name[i])
+        i += 1
+    return "".join(out)
+
+
+def _strip_brackets(name: str) -> str:
+    """Drop closed '[...]' tags together with any whitespace before them."""
+    out = []
+    i = 0
+    n = len(name)
+    while i < n:
+        if name[i] == "[":
+            close = name.find("]", i + 1)
+            if close != -1:
+                while out and out[-1].isspace():
+                    out.pop()
+                i = close + 1
+                continue
+        out.append(name[i])
+        i += 1
+    return "".join(out)
+
+
+def _unwrap_parens(name: str) -> str:
+    """Unwrap non-nested, non-empty '(...)' fragments, keeping the content."""
+    out = []
+    i = 0
+    n = len(name)
+    while i < n:
+        if name[i] == "(":
+            j = i + 1
+            while j < n and name[j] not in "()":
+                j += 1
+            if j < n and name[j] == ")" and j > i + 1:
+                out.append(name[i + 1:j])
+                i = j + 1
+                continue
+        out.append(name[i])
+        i += 1
+    return "".join(out)
+
+
+def _collapse_spaces(name: str) -> str:
+    """Collapse runs of two or more whitespace characters to a single space."""
+    out = []
+    i = 0
+    n = len(name)
+    while i < n:
+        if name[i].isspace():
+            j = i + 1
+            while j < n and name[j].isspace():
+                j += 1
+            out.append(" " if j - i >= 2 else name[i])
+            i = j
+        else:
+            out.append(name[i])
+            i += 1
+    return "".join(out)
+
 
 def clean_name(name: str) -> str:
     """
@@ -15,22 +121,29 @@ def clean_name(name: str) -> str:
     - Remove embedded audio extensions like '.m4a', '.mp3', '.wav', etc.
     - Remove bracketed tags like '[Official Audio]'
     - Simplify patterns like 'Artist - (Title) [tag] - Artist' -> 'Title - Artist'
+
+    Implemented as plain string passes rather than regexes; names are
+    short and this runs once per ZIP and per folder from worker threads.
     """
     # Remove prefix
     if name.startswith("Beat Sage_"):
-        name = name.replace("Beat Sage_", "", 1).strip()
+        name = name[len("Beat Sage_"):].strip()
 
     # Remove trailing parentheses metadata, e.g. " (v2-flow HEE+,S9,DO)"
-    name = re.sub(r"\s*\([^()]*\)$", "", name).strip()
+    if name.endswith(")"):
+        open_idx = name.rfind("(")
+        if open_idx != -1 and ")" not in name[open_idx + 1:-1]:
+            name = name[:open_idx]
+    name = name.strip()
 
     # Remove audio extensions wherever they appear as a token
-    name = re.sub(r"\.(m4a|mp3|wav|ogg|flac|aac)\b", "", name, flags=re.IGNORECASE)
+    name = _strip_audio_exts(name)
 
     # Remove bracketed tags like [Official Audio]
-    name = re.sub(r"\s*\[[^\]]*\]", "", name).strip()
+    name = _strip_brackets(name).strip()
 
     # Remove wrapping parentheses around title fragments, e.g. "(The Forgotten People)" -> "The Forgotten People"
-    name = re.sub(r"\(([^()]+)\)", r"\1", name)
+    name = _unwrap_parens(name)
 
     # Special case: "Artist - Title - Artist" -> "Title - Artist"
     parts = [p.strip() for p in name.split(" - ") if p.strip()]
@@ -40,14 +153,62 @@ def clean_name(name: str) -> str:
         name = " - ".join(parts)
 
     # Cleanup double spaces
-    name = re.sub(r"\s{2,}", " ", name).strip()
+    name = _collapse_spaces(name).strip()
 
     return name
 
 
+def extract_one(zip_path: Path, maps_dir: Path) -> str:
+    """
+    Extract a single ZIP into a cleaned folder name and return a status line.
+    """
+    clean_stem = clean_name(zip_path.stem)
+    extract_path = maps_dir / clean_stem
+
+    # Re-check inside the worker: two ZIPs can clean to the same stem
+    if extract_path.exists():
+        return f"[SKIP] Folder already exists for {zip_path.name}: {extract_path.name}"
+
+    extract_path.mkdir(parents=True, exist_ok=True)
+
+    # Stream each member out with a large buffer instead of extractall's
+    # small default, validating paths against zip-slip along the way.
+    try:
+        with zipfile.ZipFile(zip_path, "r") as zf:
+            root = extract_path.resolve()
+            seen_dirs = {root}
+
+            for info in zf.infolist():
+                target = (extract_path / info.filename).resolve()
+                if not target.is_relative_to(root):
+                    raise RuntimeError(f"Unsafe path in archive: {info.filename}")
+
+                if info.is_dir():
+                    if target not in seen_dirs:
+                        target.mkdir(parents=True, exist_ok=True)
+                        seen_dirs.add(target)
+                    continue
+
+                parent = target.parent
+                if parent not in seen_dirs:
+                    parent.mkdir(parents=True, exist_ok=True)
+                    seen_dirs.add(parent)
+
+                with zf.open(info) as src, open(target, "wb") as dst:
+                    shutil.copyfileobj(src, dst, length=1 << 20)
+    except Exception as e:
+        # cleanup of partial folder
+        shutil.rmtree(extract_path, ignore_errors=True)
+        return f"[ERROR] Failed to extract {zip_path.name}: {e}"
+
+    return f"[UNZIP] {zip_path.name} → {extract_path.name}/"
+
+
 def unzip_all_maps(maps_dir: Path):
     """
     Unzip all ZIPs in maps_dir into folders under maps_dir using cleaned names.
+    Extraction mixes DEFLATE decompression with small-file writes, both of
+    which release the GIL, so ZIPs are processed in a thread pool.
     """
     if not maps_dir.exists():
         print(f"[ERROR] Maps directory does not exist: {maps_dir}")
@@ -58,27 +219,85 @@ def unzip_all_maps(maps_dir: Path):
         print(f"[INFO] No ZIP files found in {maps_dir}")
         return
 
+    to_extract = []
     for zip_path in zips:
         clean_stem = clean_name(zip_path.stem)
-        extract_path = maps_dir / clean_stem
-
-        if extract_path.exists():
-            print(f"[SKIP] Folder already exists for {zip_path.name}: {extract_path.name}")
+        if (maps_dir / clean_stem).exists():
+            print(f"[SKIP] Folder already exists for {zip_path.name}: {clean_stem}")
             continue
+        to_extract.append(zip_path)
+
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = [executor.submit(extract_one, zp, maps_dir) for zp in to_extract]
+        for future in as_completed(futures):
+            print(future.result())
+
+
+# Generous worker count for the .dat cleaners: the work is JSON parsing
+# (C code) plus small-file I/O, both of which release the GIL.
+DAT_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Marker file dropped into each fully cleaned map folder. Bump the
+# version whenever the cleaning logic changes so old markers invalidate.
+MARKER_NAME = ".cartographer_cleaned"
+CLEANER_VERSION = "1"
 
-        print(f"[UNZIP] {zip_path.name} → {extract_path.name}/")
-        extract_path.mkdir(parents=True, exist_ok=True)
 
-        try:
-            with zipfile.ZipFile(zip_path, "r") as zf:
-                zf.extractall(extract_path)
-        except Exception as e:
-            print(f"[ERROR] Failed to extract {zip_path.name}: {e}")
-            # best-effort cleanup of partial folder
-            for child in extract_path.iterdir():
-                if child.is_file():
-                    child.unlink()
-            extract_path.rmdir()
+def clean_marker_key(author_name: str) -> str:
+    return hashlib.sha1(f"{author_name}|{CLEANER_VERSION}".encode("utf-8")).hexdigest()
+
+
+def is_marked_clean(folder: Path, marker_key: str) -> bool:
+    try:
+        return (folder / MARKER_NAME).read_text(encoding="utf-8").strip() == marker_key
+    except OSError:
+        return False
+
+
+def mark_clean(folder: Path, marker_key: str):
+    (folder / MARKER_NAME).write_text(marker_key + "\n", encoding="utf-8")
+
+
+def atomic_write_bytes(path: Path, data: bytes, fsync: bool = False):
+    """
+    Write data to a sibling temp file and rename it into place, so an
+    interrupted run never leaves a truncated .dat behind. os.replace is
+    atomic within a directory on both POSIX and Windows.
+    """
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with tmp_path.open("wb") as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def run_dat_jobs(jobs, executor: ThreadPoolExecutor | None = None) -> set[Path]:
+    """
+    Run (folder, func, *args) jobs on a thread pool and print non-empty
+    results from the main thread. Uses the given executor if provided so
+    both cleaning phases can share one pool. Returns the folders whose
+    jobs reported an error, so callers can withhold the cleaned marker.
+    """
+    failed: set[Path] = set()
+
+    def drain(ex: ThreadPoolExecutor):
+        futures = {ex.submit(func, *args): folder for folder, func, *args in jobs}
+        for future in as_completed(futures):
+            msg = future.result()
+            if msg:
+                print(msg)
+                if msg.startswith("[ERROR]"):
+                    failed.add(futures[future])
+
+    if executor is not None:
+        drain(executor)
+    else:
+        with ThreadPoolExecutor(max_workers=DAT_WORKERS) as ex:
+            drain(ex)
+
+    return failed
 
 
 def find_info_dat(folder: Path) -> Path | None:
@@ -93,49 +312,40 @@ def find_info_dat(folder: Path) -> Path | None:
     return None
 
 
-def update_info_dat(maps_dir: Path, author_name: str):
+def process_info(info_dat: Path, author_name: str, fsync: bool = False) -> str:
     """
-    Modify Info.dat in each extracted map folder:
+    Clean a single Info.dat:
     - Set _levelAuthorName
     - Remove _creator
     - Remove root-level _customData
     """
-    for folder in maps_dir.iterdir():
-        if not folder.is_dir():
-            continue
+    folder_name = info_dat.parent.name
 
-        info_dat = find_info_dat(folder)
-        if info_dat is None:
-            print(f"[WARN] No Info.dat found in {folder.name}")
-            continue
+    try:
+        data = loads_dat(info_dat.read_bytes())
+    except Exception as e:
+        return f"[ERROR] Failed to read/parse Info.dat in {folder_name}: {e}"
 
-        try:
-            data = json.loads(info_dat.read_text(encoding="utf-8"))
-        except Exception as e:
-            print(f"[ERROR] Failed to read/parse Info.dat in {folder.name}: {e}")
-            continue
+    data["_levelAuthorName"] = author_name
 
-        data["_levelAuthorName"] = author_name
+    if "_creator" in data:
+        del data["_creator"]
 
-        if "_creator" in data:
-            del data["_creator"]
+    if "_customData" in data:
+        del data["_customData"]
 
-        if "_customData" in data:
-            del data["_customData"]
+    try:
+        atomic_write_bytes(info_dat, dumps_dat(data), fsync=fsync)
+    except Exception as e:
+        return f"[ERROR] Failed writing Info.dat in {folder_name}: {e}"
 
-        try:
-            info_dat.write_text(
-                json.dumps(data, indent=2, ensure_ascii=False),
-                encoding="utf-8"
-            )
-            print(f"[EDIT] Cleaned Info.dat in {folder.name}")
-        except Exception as e:
-            print(f"[ERROR] Failed writing Info.dat in {folder.name}: {e}")
+    return f"[EDIT] Cleaned Info.dat in {folder_name}"
 
 
-def clean_difficulty_files(maps_dir: Path):
+def process_diff(dat_file: Path, fsync: bool = False) -> str | None:
     """
-    Remove _customData from all difficulty *.dat files.
+    Remove _customData from a single difficulty .dat file.
+    Returns a status line, or None when the file needed no changes.
     """
     keys_to_scan = [
         "_notes",
@@ -146,62 +356,157 @@ def clean_difficulty_files(maps_dir: Path):
         "_waypoints",
     ]
 
+    folder_name = dat_file.parent.name
+
+    try:
+        blob = dat_file.read_bytes()
+        # Fast path: if the key never appears in the raw bytes there is
+        # nothing to strip, so skip parsing entirely. A false positive
+        # (the token inside a string value) just falls through to the
+        # full scan, which handles the no-op case.
+        if b'"_customData"' not in blob:
+            return None
+        data = loads_dat(blob)
+    except Exception as e:
+        return f"[ERROR] Failed to read/parse {dat_file.name} in {folder_name}: {e}"
+
+    modified = False
+
+    if "_customData" in data:
+        del data["_customData"]
+        modified = True
+
+    for key in keys_to_scan:
+        arr = data.get(key)
+        if not isinstance(arr, list):
+            continue
+        for obj in arr:
+            if isinstance(obj, dict) and "_customData" in obj:
+                del obj["_customData"]
+                modified = True
+
+    if not modified:
+        return None
+
+    try:
+        atomic_write_bytes(dat_file, dumps_dat(data), fsync=fsync)
+    except Exception as e:
+        return f"[ERROR] Failed writing {dat_file.name} in {folder_name}: {e}"
+
+    return f"[CLEAN] Removed custom data from {dat_file.name} in {folder_name}"
+
+
+def update_info_dat(
+    maps_dir: Path,
+    author_name: str,
+    executor: ThreadPoolExecutor | None = None,
+    fsync: bool = False,
+    skip_marker_key: str | None = None,
+) -> set[Path]:
+    """
+    Clean the Info.dat in each extracted map folder (see process_info).
+    Returns the folders that could not be fully cleaned.
+    """
+    infos = []
+    failed: set[Path] = set()
+    skipped = 0
     for folder in maps_dir.iterdir():
         if not folder.is_dir():
             continue
 
-        for dat_file in folder.glob("*.dat"):
-            if dat_file.name.lower() == "info.dat":
-                continue
+        if skip_marker_key is not None and is_marked_clean(folder, skip_marker_key):
+            skipped += 1
+            continue
 
-            try:
-                data = json.loads(dat_file.read_text(encoding="utf-8"))
-            except Exception as e:
-                print(f"[ERROR] Failed to read/parse {dat_file.name} in {folder.name}: {e}")
-                continue
+        info_dat = find_info_dat(folder)
+        if info_dat is None:
+            print(f"[WARN] No Info.dat found in {folder.name}")
+            failed.add(folder)
+            continue
 
-            modified = False
+        infos.append((folder, info_dat))
 
-            if "_customData" in data:
-                del data["_customData"]
-                modified = True
+    if skipped:
+        print(f"[SKIP] {skipped} folders already cleaned")
 
-            for key in keys_to_scan:
-                arr = data.get(key)
-                if not isinstance(arr, list):
-                    continue
-                for obj in arr:
-                    if isinstance(obj, dict) and "_customData" in obj:
-                        del obj["_customData"]
-                        modified = True
+    failed |= run_dat_jobs(
+        [(folder, process_info, p, author_name, fsync) for folder, p in infos],
+        executor,
+    )
+    return failed
 
-            if not modified:
-                continue
 
-            try:
-                dat_file.write_text(
-                    json.dumps(data, indent=2, ensure_ascii=False),
-                    encoding="utf-8"
-                )
-                print(f"[CLEAN] Removed custom data from {dat_file.name} in {folder.name}")
-            except Exception as e:
-                print(f"[ERROR] Failed writing {dat_file.name} in {folder.name}: {e}")
+def clean_difficulty_files(
+    maps_dir: Path,
+    executor: ThreadPoolExecutor | None = None,
+    fsync: bool = False,
+    skip_marker_key: str | None = None,
+) -> set[Path]:
+    """
+    Remove _customData from all difficulty *.dat files.
+    Returns the folders that could not be fully cleaned.
+    """
+    diffs = [
+        (folder, dat_file)
+        for folder in maps_dir.iterdir()
+        if folder.is_dir()
+        and not (skip_marker_key is not None and is_marked_clean(folder, skip_marker_key))
+        for dat_file in folder.glob("*.dat")
+        if dat_file.name.lower() != "info.dat"
+    ]
+
+    return run_dat_jobs(
+        [(folder, process_diff, d, fsync) for folder, d in diffs],
+        executor,
+    )
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Clean and normalize Beat Sage map folders.")
+    parser.add_argument(
+        "--force-clean",
+        action="store_true",
+        help="Re-clean all folders, ignoring the cleaned markers from previous runs",
+    )
+    return parser.parse_args()
 
 
 def main():
     cfg = load_config()
+    args = get_args()
+
     base_dir = Path(cfg["base_dir"])
     maps_dir = base_dir / cfg["paths"]["maps"]
     author_name = cfg["postprocess"]["author_name"]
+    fsync_dats = bool(cfg["postprocess"].get("fsync_dats", False))
+
+    # Folders carrying a marker for this author/cleaner version are
+    # skipped entirely on re-runs unless --force-clean is passed.
+    marker_key = clean_marker_key(author_name)
+    skip_marker_key = None if args.force_clean else marker_key
 
     print("=== Unzipping Beat Sage maps ===")
     unzip_all_maps(maps_dir)
 
-    print("=== Updating Info.dat author and cleaning custom data ===")
-    update_info_dat(maps_dir, author_name)
-
-    print("=== Cleaning difficulty .dat files (removing _customData) ===")
-    clean_difficulty_files(maps_dir)
+    with ThreadPoolExecutor(max_workers=DAT_WORKERS) as executor:
+        print("=== Updating Info.dat author and cleaning custom data ===")
+        failed = update_info_dat(
+            maps_dir, author_name, executor,
+            fsync=fsync_dats, skip_marker_key=skip_marker_key,
+        )
+
+        print("=== Cleaning difficulty .dat files (removing _customData) ===")
+        failed |= clean_difficulty_files(
+            maps_dir, executor,
+            fsync=fsync_dats, skip_marker_key=skip_marker_key,
+        )
+
+    if maps_dir.exists():
+        for folder in maps_dir.iterdir():
+            if not folder.is_dir() or folder in failed:
+                continue
+            if not is_marked_clean(folder, marker_key):
+                mark_clean(folder, marker_key)
 
     print("=== Done. Maps are cleaned and ready for ChroMapper. ===")
 
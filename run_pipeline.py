@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
 import argparse
+import hashlib
+import shutil
 import subprocess
 import sys
 from pathlib import Path
@@ -25,11 +27,33 @@ def create_venv_if_needed():
     if not pip.exists():
         raise RuntimeError("pip not found in the virtual environment.")
 
-    if REQUIREMENTS.exists():
-        print("=== Installing dependencies ===")
-        subprocess.run([str(pip), "install", "-r", str(REQUIREMENTS)], check=True)
-    else:
+    if not REQUIREMENTS.exists():
         print("=== No requirements.txt found, skipping dependency installation ===")
+        return
+
+    # Skip the install entirely when requirements.txt hasn't changed
+    # since the last successful install into this venv.
+    req_hash = hashlib.sha256(REQUIREMENTS.read_bytes()).hexdigest()
+    hash_file = VENV_DIR / ".req_hash"
+    if hash_file.exists() and hash_file.read_text(encoding="utf-8").strip() == req_hash:
+        print("=== Dependencies unchanged, skipping install ===")
+        return
+
+    print("=== Installing dependencies ===")
+    uv = shutil.which("uv")
+    if uv:
+        # uv resolves and installs far faster than pip when available
+        subprocess.run(
+            [uv, "pip", "install", "--python", str(VENV_DIR / "bin" / "python"),
+             "-r", str(REQUIREMENTS)],
+            check=True,
+        )
+    else:
+        subprocess.run(
+            [str(pip), "install", "--disable-pip-version-check", "-r", str(REQUIREMENTS)],
+            check=True,
+        )
+    hash_file.write_text(req_hash + "\n", encoding="utf-8")
 
 
 def run_step(name: str, command: list[str], yes: bool = False):
@@ -58,7 +82,18 @@ def main():
     parser.add_argument("--skip-download", action="store_true")
     parser.add_argument("--skip-generate", action="store_true")
     parser.add_argument("--skip-clean", action="store_true")
+    parser.add_argument(
+        "--force-clean",
+        action="store_true",
+        help="Re-clean all map folders, ignoring cleaned markers from previous runs",
+    )
     parser.add_argument("--yes", action="store_true", help="Run all steps without prompting (CI mode)")
+    parser.add_argument(
+        "--concurrent-pipeline",
+        action="store_true",
+        help="Overlap the download and generate steps: map generation starts on "
+             "songs as soon as they finish downloading",
+    )
     args = parser.parse_args()
 
     # Load config
@@ -78,27 +113,67 @@ def main():
     # Use the venv's Python interpreter
     python = str(VENV_DIR / "bin" / "python")
 
-    # 1. Download songs
-    if not args.skip_download:
-        run_step(
-            "Download Songs",
-            [python, str(project_root / "download_songs.py")],
-            yes=args.yes
-        )
+    concurrent = (
+        args.concurrent_pipeline
+        and not args.skip_download
+        and not args.skip_generate
+    )
 
-    # 2. Generate maps
-    if not args.skip_generate:
-        run_step(
-            "Generate Maps",
-            [python, str(project_root / "generate_maps.py")],
-            yes=args.yes
+    if concurrent:
+        # 1+2. Download songs and generate maps concurrently. The watcher
+        # polls songs_dir and stops once the downloader's sentinel lands.
+        print("\n=== Download Songs + Generate Maps (concurrent) ===")
+
+        songs_dir = Path(cfg["base_dir"]) / cfg["paths"]["songs"]
+        songs_dir.mkdir(parents=True, exist_ok=True)
+        sentinel = songs_dir / ".download_done"
+        sentinel.unlink(missing_ok=True)
+
+        download_proc = subprocess.Popen(
+            [python, str(project_root / "download_songs.py")]
         )
+        generate_proc = subprocess.Popen(
+            [python, str(project_root / "generate_maps.py"), "--watch"]
+        )
+
+        download_rc = download_proc.wait()
+        if not sentinel.exists():
+            # Downloader died before writing its sentinel; unblock the watcher
+            sentinel.write_text("", encoding="utf-8")
+        generate_rc = generate_proc.wait()
+
+        if download_rc or generate_rc:
+            print(
+                f"[ERROR] Concurrent pipeline failed "
+                f"(download={download_rc}, generate={generate_rc})"
+            )
+            sys.exit(download_rc or generate_rc)
+        print("[OK] Download Songs + Generate Maps completed.")
+    else:
+        # 1. Download songs
+        if not args.skip_download:
+            run_step(
+                "Download Songs",
+                [python, str(project_root / "download_songs.py")],
+                yes=args.yes
+            )
+
+        # 2. Generate maps
+        if not args.skip_generate:
+            run_step(
+                "Generate Maps",
+                [python, str(project_root / "generate_maps.py")],
+                yes=args.yes
+            )
 
     # 3. Clean maps
     if not args.skip_clean:
+        clean_cmd = [python, str(project_root / "manipulate_files.py")]
+        if args.force_clean:
+            clean_cmd.append("--force-clean")
         run_step(
             "Clean/Finalize Maps",
-            [python, str(project_root / "manipulate_files.py")],
+            clean_cmd,
             yes=args.yes
         )
 